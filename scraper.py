@@ -6,14 +6,42 @@ Fetches offers from Mercado Libre Argentina and outputs them as HTML cards.
 Includes price history verification via MercadoTrack for top discounted items.
 """
 
+import functools
+import gzip
+import hashlib
+import io
+import jinja2
 import json
 import logging
 import re
+import numpy as np
+import os
+import queue
 import requests
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
+from operator import itemgetter
 from pathlib import Path
 
+# Optional streaming JSON parser; with it we only materialize the offer
+# items instead of the full multi-megabyte preloaded state
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional fast JSON codec, used for the on-disk cache. The embedded-state
+# extraction keeps using json's raw_decode: orjson cannot start mid-string,
+# so it would force slicing out the JSON payload first.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 LOG_FILE = Path(__file__).parent / "scraper.log"
 
@@ -47,41 +75,177 @@ def setup_logging():
 log = setup_logging()
 
 BASE_URL = "https://www.mercadolibre.com.ar/ofertas"
+
+# Disk cache for MercadoTrack price history; snapshots change at most daily
+CACHE_DIR = Path(__file__).parent / ".mt_cache"
+MT_CACHE_TTL = 86400  # seconds, per-product price history
+MT_FEATURED_CACHE_TTL = 600  # seconds, featured-offers page
+
+# Cache entries untouched for this long are deleted at the start of a run
+_CACHE_PRUNE_AGE = 30 * 86400  # seconds
+
+# Cap concurrent MercadoTrack calls and retry 429s with exponential backoff
+_MT_SEMAPHORE = threading.Semaphore(5)
+_MT_429_RETRIES = 2
+
 MERCADOTRACK_URL = "https://mercadotrack.com/MLA/trackings"
 MERCADOTRACK_FEATURED_URL = "https://mercadotrack.com/MLA"
 HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    # Negotiate compressed responses; brotli needs the brotli package
+    # installed for requests/urllib3 to decode it (curl_cffi has it built in)
+    "Accept-Encoding": "gzip, deflate, br",
 }
 
+# Shared session so TCP/TLS connections are reused across requests.
+# Prefer curl_cffi for browser TLS impersonation (anti-bot layers throttle
+# vanilla user agents) and HTTP/2 multiplexing; fall back to plain requests
+# when it is not installed. Impersonation sets its own browser headers.
+try:
+    from curl_cffi import requests as crequests
+    from curl_cffi.requests import exceptions as http_exceptions
+
+    SESSION = crequests.Session(impersonate="chrome120")
+except ImportError:
+    from urllib3.util.retry import Retry
+
+    http_exceptions = requests.exceptions
+    SESSION = requests.Session()
+    SESSION.headers.update(HEADERS)
+    SESSION.mount("https://", requests.adapters.HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    ))
+
 # Different offer types to scrape
 OFFER_SOURCES = [
     {"name": "Ofertas del Día", "params": {"container_id": "MLA779357-1"}},
     {"name": "Ofertas Relámpago", "params": {"container_id": "MLA779357-1", "promotion_type": "lightning"}},
 ]
 
-# Regex to extract __PRELOADED_STATE__ JSON
-PRELOADED_STATE_PATTERN = re.compile(
-    r'window\.__PRELOADED_STATE__\s*=\s*(\{.+\});',
-    re.DOTALL
-)
+# Marker preceding the embedded __PRELOADED_STATE__ JSON
+PRELOADED_STATE_MARKER = "window.__PRELOADED_STATE__"
+
+# All regexes are compiled once here and invoked via their bound methods
+# (PATTERN.search(s), never re.search(PATTERN, s)): the module-level re
+# functions re-enter _compile's cache/flag checks on every call.
 
-# Regex to extract MLA product ID from URLs
-MLA_ID_PATTERN = re.compile(r'MLA\d+')
+# Regex to extract MLA product ID from URLs; product pages write the ID as
+# "MLA-12345" while offer/tracking links use "MLA12345", so the hyphen is
+# optional and the canonical unhyphenated form is rebuilt from the digits
+MLA_ID_PATTERN = re.compile(r'MLA-?(\d+)')
 
 # Regex to extract image ID from mlstatic URLs
 MLSTATIC_IMAGE_PATTERN = re.compile(r'https?://http2\.mlstatic\.com/D_([^-]+)-')
 
+# Patterns for scraping the MercadoTrack featured page, compiled once here
+# instead of on every call/block
+_TRACKING_RE = re.compile(r'/MLA/trackings/(MLA\d+)')
+# Single fused pattern for all four per-block fields (name, price, discount
+# badge, image URL) so each block is scanned once instead of four times.
+# The match dispatches on .lastgroup. Notes on the alternatives:
+#   - name excludes '$' so price paragraphs fall through to the price branch
+#   - the discount badge uses a lookahead for the closing '<' so it never
+#     swallows the opening bracket of the next tag
+_MT_FIELDS_RE = re.compile(
+    r'<p[^>]*>(?P<name>[^<$]{10,200})</p>'  # First substantial <p> tag
+    r'|\$\s*(?P<price>[\d.,]+)'  # Prices like "$ 340.564,03"
+    r'|[>"\'](?P<discount>-[\d.,]+%)["\']?(?=<)'  # Discount badges like "-11,85%"
+    r'|(?P<image>https?://http2\.mlstatic\.com/D_[^"\'>\s]+)'
+)
+
+# Maps the format() thousands separator to the Argentine one in one pass
+_THOUSANDS = str.maketrans({",": "."})
+
+# Normalizes Argentine-formatted prices ("100.000,50") for float() in one
+# pass: drop thousands dots, turn the decimal comma into a dot
+_PRICE_TRANS = str.maketrans({".": None, ",": "."})
+
+# Shared decoder so each parse site skips constructing a fresh JSONDecoder
+_DECODER = json.JSONDecoder()
+
+
+def fmt_ars(amount: float) -> str:
+    """Format an amount as Argentine pesos, e.g. 1234567 -> "$1.234.567"."""
+    return "$" + format(amount, ",.0f").translate(_THOUSANDS)
+
+
+def _read_json_file(path: Path):
+    """Parse a JSON file, returning None when missing or corrupt."""
+    try:
+        raw = path.read_bytes()
+        if orjson is not None:
+            return orjson.loads(raw)
+        return _DECODER.decode(raw.decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_load(name: str, ttl: float):
+    """Return the cached JSON payload for `name` if fresh, else None."""
+    cache_file = CACHE_DIR / f"{name}.json"
+    try:
+        if time.time() - cache_file.stat().st_mtime < ttl:
+            return _read_json_file(cache_file)
+    except OSError:
+        pass  # missing entry, caller fetches fresh
+    return None
+
+
+def _cache_store(name: str, payload) -> None:
+    """Persist a JSON payload under `name` in the on-disk cache."""
+    try:
+        if orjson is not None:
+            data = orjson.dumps(payload)
+        else:
+            data = json.dumps(payload).encode("utf-8")
+        CACHE_DIR.mkdir(exist_ok=True)
+        cache_file = CACHE_DIR / f"{name}.json"
+        try:
+            if cache_file.read_bytes() == data:
+                # Unchanged payload: refresh the TTL clock without
+                # rewriting the file
+                os.utime(cache_file)
+                return
+        except OSError:
+            pass
+        cache_file.write_bytes(data)
+    except OSError as e:
+        log.debug(f"Could not cache {name}: {e}")
+
+
+def _prune_cache() -> None:
+    """Drop cache entries untouched for longer than _CACHE_PRUNE_AGE.
+
+    Products fall out of the offer rotation; without this the cache
+    directory grows by one file per product ever seen.
+    """
+    cutoff = time.time() - _CACHE_PRUNE_AGE
+    try:
+        for entry in CACHE_DIR.glob("*.json"):
+            if entry.stat().st_mtime < cutoff:
+                entry.unlink(missing_ok=True)
+    except OSError:
+        pass
 
 
 def fetch_mercadotrack_featured() -> list[dict]:
     """Fetch featured offers from MercadoTrack Argentina."""
     log.info("\n📊 Fetching MercadoTrack Featured Offers...")
     log.info("-" * 40)
-    
+
+    # The featured page changes slowly; a short-TTL cache entry lets quick
+    # successive runs (e.g. local debugging) skip the network round trip
+    cached = _cache_load("featured", MT_FEATURED_CACHE_TTL)
+    if cached is not None:
+        log.info(f"  Using cached featured offers ({len(cached)} offers)")
+        return cached
+
     try:
-        start_time = datetime.now()
-        response = requests.get(MERCADOTRACK_FEATURED_URL, headers=HEADERS, timeout=30)
-        elapsed = (datetime.now() - start_time).total_seconds()
+        t0 = time.monotonic()
+        response = SESSION.get(MERCADOTRACK_FEATURED_URL, timeout=30)
+        elapsed = time.monotonic() - t0
         
         log.debug(f"MercadoTrack response: status={response.status_code}, time={elapsed:.2f}s")
         
@@ -89,7 +253,7 @@ def fetch_mercadotrack_featured() -> list[dict]:
             log.error(f"MercadoTrack returned {response.status_code}")
             return []
         
-        html = response.text
+        html = response.content.decode("utf-8", errors="replace")
         offers = []
         
         # Parse offer cards from the HTML
@@ -104,78 +268,69 @@ def fetch_mercadotrack_featured() -> list[dict]:
         
         featured_section = html[featured_start:featured_end] if featured_end > featured_start else html[featured_start:]
         
-        # Extract all MLA IDs from tracking links
-        tracking_pattern = re.compile(r'/MLA/trackings/(MLA\d+)')
-        mla_ids = tracking_pattern.findall(featured_section)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_mla_ids = []
-        for mla_id in mla_ids:
-            if mla_id not in seen:
-                seen.add(mla_id)
-                unique_mla_ids.append(mla_id)
-        
-        log.info(f"  Found {len(unique_mla_ids)} featured offers")
-        
+        # Extract all MLA IDs from tracking links along with where each link
+        # sits in the section. Dicts are insertion-ordered, so setdefault
+        # dedups in a single pass keeping each ID's first offset; the offsets
+        # let us slice each card's block directly instead of re-searching the
+        # whole section for every ID.
+        unique_matches = {}
+        for tracking_match in _TRACKING_RE.finditer(featured_section):
+            unique_matches.setdefault(tracking_match.group(1), tracking_match.start())
+
+        log.info(f"  Found {len(unique_matches)} featured offers")
+
         # Extract product data for each MLA ID
-        for mla_id in unique_mla_ids:
-            # Find the block containing this MLA ID
-            idx = featured_section.find(f'/MLA/trackings/{mla_id}')
-            if idx == -1:
-                continue
-            
+        for mla_id, idx in unique_matches.items():
             # Get a chunk of HTML around this link to extract data
             block_start = max(0, idx - 100)
             block_end = min(len(featured_section), idx + 2000)
             block = featured_section[block_start:block_end]
             
-            # Extract product name - look for the title after the image
+            # Single pass over the block collecting every field at once,
+            # dispatching on which alternative matched
             name = None
-            # Try to find text content after "Featured image" alt text
-            name_patterns = [
-                re.compile(r'<p[^>]*>([^<]{10,200})</p>'),  # First substantial <p> tag
-            ]
-            
-            for pattern in name_patterns:
-                matches = pattern.findall(block)
-                for match in matches:
-                    # Skip prices (they contain $)
-                    if '$' not in match and 'Hace' not in match and len(match.strip()) > 10:
-                        name = match.strip()
-                        break
-                if name:
-                    break
-            
-            # Extract prices using pattern like "$ 340.564,03"
-            price_pattern = re.compile(r'\$\s*([\d.,]+)')
-            prices = price_pattern.findall(block)
-            
+            prices = []
+            discount_match = None
+            image_url = None
+            for match in _MT_FIELDS_RE.finditer(block):
+                group = match.lastgroup
+                if group == 'name':
+                    # Skip relative timestamps; prices are excluded by the pattern
+                    candidate = match.group('name').strip()
+                    if name is None and 'Hace' not in candidate and len(candidate) > 10:
+                        name = candidate
+                elif group == 'price':
+                    prices.append(match.group('price'))
+                elif group == 'discount':
+                    if discount_match is None:
+                        discount_match = match.group('discount')
+                elif image_url is None:
+                    image_url = match.group('image')
+
+
             original_price = 0
             current_price = 0
             if len(prices) >= 2:
                 # First price is original, second is current (discounted)
                 try:
-                    original_price = float(prices[0].replace('.', '').replace(',', '.'))
-                    current_price = float(prices[1].replace('.', '').replace(',', '.'))
+                    original_price = float(prices[0].translate(_PRICE_TRANS))
+                    current_price = float(prices[1].translate(_PRICE_TRANS))
                 except ValueError:
                     pass
             elif len(prices) == 1:
                 try:
-                    current_price = float(prices[0].replace('.', '').replace(',', '.'))
+                    current_price = float(prices[0].translate(_PRICE_TRANS))
                 except ValueError:
                     pass
             
-            # Extract discount percentage - look for patterns like "-11,85%" or "-11.85%"
-            # Avoid matching percentages in product names (like "87% Tkl")
+            # Parse discount percentage from the badge match ("-11,85%" or
+            # "-11.85%"); the badge pattern avoids percentages in product
+            # names (like "87% Tkl")
             discount = 0
-            # Look for discount badge pattern: negative percentage with optional quotes
-            discount_pattern = re.compile(r'[>"\'](-[\d.,]+%)["\']?<')
-            discount_matches = discount_pattern.findall(block)
-            if discount_matches:
+            if discount_match:
                 try:
                     # Remove the leading dash and trailing %
-                    discount_str = discount_matches[0].strip('-').strip('%')
+                    discount_str = discount_match.strip('-').strip('%')
                     discount = float(discount_str.replace(',', '.'))
                 except ValueError:
                     pass
@@ -184,13 +339,6 @@ def fetch_mercadotrack_featured() -> list[dict]:
             if discount == 0 and original_price > 0 and current_price > 0 and original_price > current_price:
                 discount = round((1 - current_price / original_price) * 100, 2)
             
-            # Extract image URL
-            image_url = None
-            image_pattern = re.compile(r'https?://http2\.mlstatic\.com/D_[^"\'>\s]+')
-            image_matches = image_pattern.findall(block)
-            if image_matches:
-                image_url = image_matches[0]
-            
             # Build the offer object
             if name or mla_id:
                 offer = {
@@ -207,12 +355,14 @@ def fetch_mercadotrack_featured() -> list[dict]:
                 log.debug(f"  → {name[:50] if name else mla_id}... ({discount:.1f}% OFF)")
         
         log.info(f"  Successfully parsed {len(offers)} offers")
+        if offers:
+            _cache_store("featured", offers)
         return offers
         
-    except requests.exceptions.Timeout:
+    except http_exceptions.Timeout:
         log.error("Timeout fetching MercadoTrack featured offers")
         return []
-    except requests.exceptions.RequestException as e:
+    except http_exceptions.RequestException as e:
         log.error(f"Network error fetching MercadoTrack: {e}")
         return []
     except Exception as e:
@@ -225,12 +375,12 @@ def fetch_page(base_params: dict, page_num: int) -> str:
     params = {**base_params, "page": page_num}
     log.debug(f"Fetching page {page_num} with params: {params}")
     
-    start_time = datetime.now()
-    response = requests.get(BASE_URL, params=params, headers=HEADERS, timeout=30)
-    elapsed = (datetime.now() - start_time).total_seconds()
-    
-    log.debug(f"Response: status={response.status_code}, size={len(response.text)} bytes, time={elapsed:.2f}s")
-    
+    t0 = time.monotonic()
+    response = SESSION.get(BASE_URL, params=params, timeout=30)
+    elapsed = time.monotonic() - t0
+
+    log.debug(f"Response: status={response.status_code}, size={len(response.content)} bytes, time={elapsed:.2f}s")
+
     # Log potential rate limiting indicators
     if response.status_code == 429:
         log.warning(f"RATE LIMITED (429) on page {page_num} - consider adding delays")
@@ -240,89 +390,128 @@ def fetch_page(base_params: dict, page_num: int) -> str:
         log.warning(f"Slow response ({elapsed:.2f}s) - possible throttling")
     
     response.raise_for_status()
-    return response.text
+    # Both sites serve UTF-8; decoding response.content directly skips the
+    # charset-detection pass .text runs when no charset header is present
+    return response.content.decode("utf-8", errors="replace")
 
 
+@functools.lru_cache(maxsize=4096)
 def extract_mla_id(url: str) -> str | None:
-    """Extract MLA product ID from a Mercado Libre URL."""
+    """Extract MLA product ID from a Mercado Libre URL.
+
+    Memoized: the same product links recur across offer sources and the
+    dedup/featured passes, so repeat URLs skip the regex scan.
+    """
     match = MLA_ID_PATTERN.search(url)
-    return match.group(0) if match else None
+    return f"MLA{match.group(1)}" if match else None
+
+
+# Upper bound on the window we unescape when the snapshots JSON is embedded
+# inside an escaped string (each snapshot is only a few dozen bytes)
+_SNAPSHOTS_MAX_LEN = 512 * 1024
 
 
 def extract_snapshots_json(text: str) -> list[dict] | None:
     """Extract snapshots array from MercadoTrack HTML."""
-    # The JSON is escaped in the HTML, so look for escaped version
-    marker = r'\"snapshots\":['
-    start = text.find(marker)
+    # Try the unescaped form first: the decoder parses the array in place
+    # and stops at the matching bracket, no copies needed
+    start = text.find('"snapshots":[')
+    if start != -1:
+        try:
+            snapshots, _ = _DECODER.raw_decode(text, text.index("[", start))
+        except json.JSONDecodeError:
+            return None
+        return snapshots
+
+    # The JSON is usually embedded as an escaped string in the HTML. Decode
+    # the escape layer by parsing a bounded window as a JSON string literal
+    # (handles \", \\, \n, \uXXXX correctly, unlike chained replaces), then
+    # parse the snapshots array out of the decoded text.
+    start = text.find(r'\"snapshots\":[')
     if start == -1:
-        # Try unescaped version as fallback
-        marker = '"snapshots":['
-        start = text.find(marker)
-        if start == -1:
+        return None
+    window = text[start:start + _SNAPSHOTS_MAX_LEN]
+    try:
+        # The first unescaped quote terminates the enclosing string literal
+        inner, _ = _DECODER.raw_decode('"' + window)
+    except json.JSONDecodeError:
+        # The window may end mid-string: drop a dangling half escape and
+        # terminate the literal ourselves
+        if window.endswith("\\") and not window.endswith("\\\\"):
+            window = window[:-1]
+        try:
+            inner, _ = _DECODER.raw_decode('"' + window + '"')
+        except json.JSONDecodeError:
             return None
-    
-    start += len(marker) - 1  # Position at the opening bracket
-    
-    # Find matching closing bracket
-    depth = 0
-    i = 0
-    while i < len(text) - start:
-        char = text[start + i]
-        # Skip escaped characters
-        if char == '\\' and i + 1 < len(text) - start:
-            i += 2
-            continue
-        if char == '[':
-            depth += 1
-        elif char == ']':
-            depth -= 1
-            if depth == 0:
-                end = start + i + 1
-                json_str = text[start:end]
-                # Unescape the string
-                json_str = json_str.replace(r'\"', '"').replace(r'\\', '\\')
-                try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError:
-                    return None
-        i += 1
-    return None
+    try:
+        snapshots, _ = _DECODER.raw_decode(inner, inner.index("["))
+    except ValueError:  # covers JSONDecodeError too
+        return None
+    return snapshots
 
 
+@functools.lru_cache(maxsize=256)
 def fetch_price_history(mla_id: str) -> list[dict] | None:
-    """Fetch price history from MercadoTrack for a product."""
+    """Fetch price history from MercadoTrack for a product.
+
+    Memoized per process run: the same product can surface in several offer
+    sources, and callers only read the returned snapshots.
+    """
+    cached = _cache_load(mla_id, MT_CACHE_TTL)
+    if cached is not None:
+        log.debug(f"Price history cache hit for {mla_id} ({len(cached)} snapshots)")
+        return cached
+
     url = f"{MERCADOTRACK_URL}/{mla_id}"
     log.debug(f"Fetching price history for {mla_id} from MercadoTrack")
-    
+
     try:
-        start_time = datetime.now()
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        elapsed = (datetime.now() - start_time).total_seconds()
-        
-        log.debug(f"MercadoTrack response: status={response.status_code}, time={elapsed:.2f}s")
-        
+        for attempt in range(_MT_429_RETRIES + 1):
+            # The semaphore caps concurrent MercadoTrack calls below the
+            # thread pool size so we stay under their rate limit
+            with _MT_SEMAPHORE:
+                t0 = time.monotonic()
+                response = SESSION.get(url, timeout=15)
+                elapsed = time.monotonic() - t0
+
+            log.debug(f"MercadoTrack response: status={response.status_code}, time={elapsed:.2f}s")
+
+            if response.status_code != 429:
+                break
+            if attempt == _MT_429_RETRIES:
+                break  # out of retries; no point sleeping before giving up
+            backoff = 2 ** attempt
+            log.warning(f"MercadoTrack RATE LIMITED (429) for {mla_id}, retrying in {backoff}s")
+            time.sleep(backoff)
+
         if response.status_code == 429:
-            log.warning(f"MercadoTrack RATE LIMITED (429) for {mla_id}")
+            log.warning(f"MercadoTrack RATE LIMITED (429) for {mla_id}, giving up")
             return None
         elif response.status_code != 200:
             log.debug(f"MercadoTrack returned {response.status_code} for {mla_id}")
             return None
         
         # Extract snapshots JSON from the HTML
-        snapshots = extract_snapshots_json(response.text)
+        snapshots = extract_snapshots_json(response.content.decode("utf-8", errors="replace"))
         if not snapshots:
             log.debug(f"No price snapshots found for {mla_id}")
             return None
         
         log.info(f"Found {len(snapshots)} price snapshots for {mla_id}")
         
-        # Sort by date and return last 90 days of data
-        snapshots.sort(key=lambda x: x.get("date", ""))
-        return snapshots[-90:] if len(snapshots) > 90 else snapshots
-    except requests.exceptions.Timeout:
+        # Sort by date and keep last 90 days of data; undated snapshots
+        # can't be placed on the timeline, so drop them
+        snapshots = [s for s in snapshots if s.get("date")]
+        snapshots.sort(key=itemgetter("date"))
+        snapshots = snapshots[-90:] if len(snapshots) > 90 else snapshots
+
+        _cache_store(mla_id, snapshots)
+
+        return snapshots
+    except http_exceptions.Timeout:
         log.error(f"Timeout fetching price history for {mla_id}")
         return None
-    except requests.exceptions.RequestException as e:
+    except http_exceptions.RequestException as e:
         log.error(f"Network error fetching price history for {mla_id}: {e}")
         return None
     except Exception as e:
@@ -335,20 +524,20 @@ def analyze_price_history(snapshots: list[dict] | None, current_price: float) ->
     if not snapshots:
         return {"status": "unknown", "message": "Sin historial"}
     
-    prices = [s.get("price", 0) for s in snapshots if s.get("price")]
-    if not prices:
+    arr = np.fromiter((s.get("price", 0) for s in snapshots if s.get("price")), dtype=np.float64)
+    if arr.size == 0:
         return {"status": "unknown", "message": "Sin datos de precio"}
-    
-    min_price = min(prices)
-    max_price = max(prices)
-    avg_price = sum(prices) / len(prices)
-    
+
+    min_price = float(arr.min())
+    max_price = float(arr.max())
+    avg_price = float(arr.mean())
+
     # Get prices from last 30 days and before
-    recent_prices = prices[-30:] if len(prices) > 30 else prices
-    older_prices = prices[:-30] if len(prices) > 30 else []
-    
-    recent_avg = sum(recent_prices) / len(recent_prices) if recent_prices else avg_price
-    older_avg = sum(older_prices) / len(older_prices) if older_prices else recent_avg
+    recent = arr[-30:]
+    older = arr[:-30]
+
+    recent_avg = float(recent.mean()) if recent.size else avg_price
+    older_avg = float(older.mean()) if older.size else recent_avg
     
     # Determine if offer is genuine
     if current_price <= min_price * 1.05:  # Within 5% of all-time low
@@ -370,23 +559,62 @@ def analyze_price_history(snapshots: list[dict] | None, current_price: float) ->
         "min_price": min_price,
         "max_price": max_price,
         "avg_price": avg_price,
-        "prices": prices
+        "prices": arr.tolist()
     }
 
 
+def _find_state_start(html: str) -> int:
+    """Return the offset of the preloaded-state JSON object in the HTML.
+
+    Plain substring checks (C-level) so degenerate responses — captcha or
+    error pages without the state blob — are rejected before any parsing.
+    """
+    idx = html.find(PRELOADED_STATE_MARKER)
+    if idx == -1:
+        raise ValueError("Could not find __PRELOADED_STATE__ in HTML (blocked or captcha page?)")
+    start = html.find("{", idx)
+    if start == -1:
+        raise ValueError("Could not find __PRELOADED_STATE__ object in HTML")
+    return start
+
+
 def extract_preloaded_state(html: str) -> dict:
     """Extract the __PRELOADED_STATE__ JSON from HTML."""
-    match = PRELOADED_STATE_PATTERN.search(html)
-    if not match:
-        raise ValueError("Could not find __PRELOADED_STATE__ in HTML")
-    return json.loads(match.group(1))
+    start = _find_state_start(html)
+
+    # raw_decode parses the object and stops at its closing brace, so no
+    # regex has to scan (and backtrack over) the rest of the document
+    try:
+        state, _ = _DECODER.raw_decode(html, start)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Could not parse __PRELOADED_STATE__ JSON: {e}") from e
+    return state
 
 
-def parse_items(state: dict) -> list[dict]:
-    """Parse items from the preloaded state into a simple format."""
-    items = state.get("data", {}).get("items", [])
+def extract_state_items(html: str) -> list[dict]:
+    """Extract the raw offer items from the embedded preloaded state."""
+    if ijson is None:
+        return extract_preloaded_state(html).get("data", {}).get("items", [])
+
+    start = _find_state_start(html)
+
+    items = []
+    try:
+        # use_float keeps fractional prices as float; ijson's default
+        # Decimal is not serializable by orjson/json or bindable by sqlite3
+        for item in ijson.items(io.StringIO(html[start:]), "data.items.item", use_float=True):
+            items.append(item)
+    except ijson.IncompleteJSONError:
+        # The state object is followed by the rest of the page; hitting the
+        # trailing script content after all items were yielded is expected
+        pass
+    return items
+
+
+def parse_items(items: list[dict]) -> list[dict]:
+    """Parse raw state items into a simple format."""
     parsed = []
-    
+
     for item in items:
         card = item.get("card", {})
         if not card:
@@ -408,32 +636,29 @@ def parse_items(state: dict) -> list[dict]:
         
         # Extract title, discount, and price from components
         name = None
+        price = None
         discount = 0
-        price = 0
-        
+
         for comp in card.get("components", []):
-            if comp.get("type") == "title":
-                title_data = comp.get("title", {})
-                name = title_data.get("text")
-            
-            elif comp.get("type") == "price":
+            comp_type = comp.get("type")
+            if comp_type == "title" and name is None:
+                name = comp.get("title", {}).get("text")
+            elif comp_type == "price":
                 price_data = comp.get("price", {})
-                discount_info = price_data.get("discount", {})
-                if discount_info:
-                    # Discount value is a number
-                    discount = discount_info.get("value", 0)
-                # Get current price
-                current_price_data = price_data.get("current_price", {})
-                if current_price_data:
-                    price = current_price_data.get("value", 0)
-        
+                # Discount value is a number
+                discount = (price_data.get("discount") or {}).get("value", 0)
+                price = (price_data.get("current_price") or {}).get("value", 0)
+            # Stop scanning once both components have been seen
+            if name is not None and price is not None:
+                break
+
         if name and link and image_url:
             parsed.append({
                 "name": name,
                 "link": link,
                 "image": image_url,
                 "discount": discount,
-                "price": price
+                "price": price if price is not None else 0
             })
     
     return parsed
@@ -443,40 +668,50 @@ def scrape_offers(pages_per_source: int = 3) -> list[dict]:
     """Scrape multiple pages from all offer sources, sorted by discount (highest first)."""
     all_offers = []
     seen_urls = set()  # Deduplicate by URL
-    
-    for source in OFFER_SOURCES:
-        log.info(f"\n{source['name']}:")
-        log.info("-" * 40)
-        
-        for page_num in range(1, pages_per_source + 1):
-            log.info(f"  Fetching page {page_num}...")
+
+    # Fetch every (source, page) combination concurrently, then parse the
+    # results in deterministic order so deduplication stays stable
+    tasks = [(source, page_num) for source in OFFER_SOURCES for page_num in range(1, pages_per_source + 1)]
+    with ThreadPoolExecutor(max_workers=min(8, len(tasks))) as executor:
+        futures = {
+            (source["name"], page_num): executor.submit(fetch_page, source["params"], page_num)
+            for source, page_num in tasks
+        }
+
+        current_source = None
+        for source, page_num in tasks:
+            if source["name"] != current_source:
+                current_source = source["name"]
+                log.info(f"\n{source['name']}:")
+                log.info("-" * 40)
+
             try:
-                html = fetch_page(source["params"], page_num)
-                state = extract_preloaded_state(html)
-                offers = parse_items(state)
-                
+                html = futures[(source["name"], page_num)].result()
+                offers = parse_items(extract_state_items(html))
+
                 # Deduplicate
                 new_offers = []
                 for offer in offers:
                     if offer["link"] not in seen_urls:
                         seen_urls.add(offer["link"])
                         new_offers.append(offer)
-                
+
                 all_offers.extend(new_offers)
-                log.info(f"    Found {len(offers)} offers ({len(new_offers)} new)")
-            except requests.exceptions.HTTPError as e:
+                log.info(f"  Page {page_num}: found {len(offers)} offers ({len(new_offers)} new)")
+            except http_exceptions.HTTPError as e:
                 log.error(f"HTTP error on {source['name']} page {page_num}: {e}")
-            except requests.exceptions.Timeout:
+            except http_exceptions.Timeout:
                 log.error(f"Timeout on {source['name']} page {page_num}")
-            except requests.exceptions.RequestException as e:
+            except http_exceptions.RequestException as e:
                 log.error(f"Network error on {source['name']} page {page_num}: {e}")
             except ValueError as e:
                 log.error(f"Parse error on {source['name']} page {page_num}: {e}")
             except Exception as e:
                 log.error(f"Unexpected error on {source['name']} page {page_num}: {type(e).__name__}: {e}")
     
-    # Sort by discount percentage (highest first)
-    all_offers.sort(key=lambda x: x.get("discount", 0), reverse=True)
+    # Sort by discount percentage (highest first); parse_items always
+    # populates "discount", so the C-implemented itemgetter is safe here
+    all_offers.sort(key=itemgetter("discount"), reverse=True)
     
     log.debug(f"Total unique offers after deduplication: {len(all_offers)}")
     return all_offers
@@ -487,627 +722,287 @@ def generate_sparkline_svg(prices: list[float], width: int = 200, height: int =
     if not prices or len(prices) < 2:
         return ""
     
-    min_p = min(prices)
-    max_p = max(prices)
+    arr = np.asarray(prices, dtype=np.float64)
+    min_p = float(arr.min())
+    max_p = float(arr.max())
     price_range = max_p - min_p if max_p != min_p else 1
-    
-    # Normalize points
-    points = []
-    for i, p in enumerate(prices):
-        x = (i / (len(prices) - 1)) * width
-        y = height - ((p - min_p) / price_range) * (height - 10) - 5
-        points.append(f"{x:.1f},{y:.1f}")
-    
-    path = "M" + " L".join(points)
-    
+
+    # Normalize points as two vectorized expressions
+    xs = np.linspace(0, width, arr.size)
+    ys = height - (arr - min_p) / price_range * (height - 10) - 5
+
+    # %-formatting skips the per-point format-spec parsing an f-string does
+    path = "M" + " L".join(
+        "%.1f,%.1f" % xy for xy in zip(xs.tolist(), ys.tolist())
+    )
+
     return f'''<svg width="{width}" height="{height}" class="sparkline">
       <path d="{path}" fill="none" stroke="#3483fa" stroke-width="2"/>
-      <circle cx="{width}" cy="{height - ((prices[-1] - min_p) / price_range) * (height - 10) - 5:.1f}" r="3" fill="#00a650"/>
+      <circle cx="{width}" cy="{ys[-1]:.1f}" r="3" fill="#00a650"/>
     </svg>'''
 
 
-def generate_mercadotrack_featured_html(mt_offers: list[dict]) -> str:
-    """Generate HTML for MercadoTrack featured offers section."""
-    if not mt_offers:
-        return ""
-    
-    cards_html = ""
-    for offer in mt_offers:
-        safe_name = (
-            offer["name"]
-            .replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-            .replace('"', "&quot;")
-        )
-        discount = offer.get("discount", 0)
-        price = offer.get("price", 0)
-        original_price = offer.get("original_price", 0)
-        price_formatted = f"${price:,.0f}".replace(",", ".")
-        original_formatted = f"${original_price:,.0f}".replace(",", ".") if original_price > 0 else ""
-        
-        discount_badge = f'<span class="mt-discount">-{discount:.1f}%</span>' if discount > 0 else ""
-        original_html = f'<span class="mt-original">{original_formatted}</span>' if original_price > 0 else ""
-        
-        image_url = offer.get("image", "")
-        mercadotrack_link = offer.get("mercadotrack_link", "#")
-        
-        cards_html += f'''
-      <a href="{mercadotrack_link}" target="_blank" class="mt-card">
-        <div class="mt-image">
-          {discount_badge}
-          <img src="{image_url}" alt="{safe_name}" loading="lazy">
-        </div>
-        <div class="mt-info">
-          <span class="mt-name">{safe_name}</span>
-          <div class="mt-prices">
-            {original_html}
-            <span class="mt-price">{price_formatted}</span>
-          </div>
-        </div>
-      </a>'''
-    
-    return f'''
-  <section class="mercadotrack-section">
-    <div class="mt-header">
-      <h2>🏷️ Ofertas Destacadas - MercadoTrack</h2>
-      <a href="https://mercadotrack.com/MLA" target="_blank" class="mt-view-all">Ver todas en MercadoTrack →</a>
-    </div>
-    <p class="mt-subtitle">Ofertas con historial de precios verificado por la comunidad de MercadoTrack</p>
-    <div class="mt-grid">{cards_html}
-    </div>
-  </section>'''
-
-
-def generate_featured_html(featured_offers: list[dict]) -> str:
-    """Generate HTML for featured offers with price history."""
-    if not featured_offers:
-        return ""
-    
-    featured_cards = ""
-    for offer in featured_offers:
-        safe_name = (
-            offer["name"]
-            .replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-            .replace('"', "&quot;")
-        )
-        discount = offer.get("discount", 0)
-        price = offer.get("price", 0)
-        price_formatted = f"${price:,.0f}".replace(",", ".")
-        
-        analysis = offer.get("price_analysis", {})
-        status = analysis.get("status", "unknown")
-        message = analysis.get("message", "Sin datos")
-        prices = analysis.get("prices", [])
-        min_price = analysis.get("min_price", 0)
-        max_price = analysis.get("max_price", 0)
-        avg_price = analysis.get("avg_price", 0)
-        
-        # Status colors
-        status_colors = {
-            "excellent": "#00a650",
-            "good": "#3483fa",
-            "suspicious": "#ff7733",
-            "normal": "#666",
-            "unknown": "#999"
-        }
-        status_color = status_colors.get(status, "#999")
-        
-        sparkline = generate_sparkline_svg(prices) if prices else '<span class="no-data">Sin historial</span>'
-        
-        mla_id = extract_mla_id(offer["link"]) or ""
-        mercadotrack_link = f"https://mercadotrack.com/MLA/trackings/{mla_id}" if mla_id else "#"
-        
-        stats_html = ""
-        if min_price > 0:
-            stats_html = f'''
-          <div class="price-stats">
-            <span>Mín: ${min_price:,.0f}</span>
-            <span>Prom: ${avg_price:,.0f}</span>
-            <span>Máx: ${max_price:,.0f}</span>
-          </div>'''
-        
-        featured_cards += f'''
-    <div class="featured-card">
-      <div class="featured-image">
-        <span class="discount">{discount}% OFF</span>
-        <img src="{offer["image"]}" alt="{safe_name}">
-      </div>
-      <div class="featured-info">
-        <a href="{offer["link"]}" target="_blank" class="featured-title">{safe_name}</a>
-        <div class="featured-price">{price_formatted}</div>
-        <div class="price-history">
-          <div class="analysis-badge" style="background: {status_color}">{message}</div>
-          {sparkline}
-          {stats_html}
-          <a href="{mercadotrack_link}" target="_blank" class="mercadotrack-link">Ver historial completo →</a>
-        </div>
-      </div>
-    </div>'''
-    
-    return f'''
-  <section class="featured-section">
-    <h2>🔍 Top 3 Ofertas - Análisis de Precio</h2>
-    <p class="featured-subtitle">Historial de precios verificado con <a href="https://mercadotrack.com" target="_blank" style="color: #3483fa;">MercadoTrack</a> para confirmar si son ofertas reales</p>
-    <div class="featured-grid">{featured_cards}
-    </div>
-  </section>'''
+# Status colors for the price-analysis badge
+_STATUS_COLORS = {
+    "excellent": "#00a650",
+    "good": "#3483fa",
+    "suspicious": "#ff7733",
+    "normal": "#666",
+    "unknown": "#999",
+}
+
+# Page template compiled once at import. auto_reload off plus an unbounded
+# cache keep the compiled bytecode for the whole run, autoescape replaces
+# the manual translate-table escaping, and the card/featured/MercadoTrack
+# loops run inside the template's compiled code instead of Python-level
+# string assembly.
+_JINJA_ENV = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(Path(__file__).parent),
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+)
+_JINJA_ENV.filters["ars"] = fmt_ars
+_JINJA_ENV.globals["sparkline"] = generate_sparkline_svg
+_JINJA_ENV.globals["status_colors"] = _STATUS_COLORS
+_TEMPLATE = _JINJA_ENV.get_template("offers_template.html")
 
 
 def generate_html(offers: list[dict], featured_offers: list[dict] | None = None, mt_offers: list[dict] | None = None) -> str:
-    """Generate HTML output with offer cards."""
+    """Render the offers page from the precompiled template."""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    mt_html = generate_mercadotrack_featured_html(mt_offers) if mt_offers else ""
-    featured_html = generate_featured_html(featured_offers) if featured_offers else ""
-    
-    cards_html = ""
-    for offer in offers:
-        # Escape HTML entities in name
-        safe_name = (
-            offer["name"]
-            .replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-            .replace('"', "&quot;")
-        )
-        discount = offer.get("discount", 0)
-        price = offer.get("price", 0)
-        discount_badge = f'<span class="discount">{discount}% OFF</span>' if discount > 0 else ""
-        price_formatted = f"${price:,.0f}".replace(",", ".")
-        
-        cards_html += f'''
-    <div class="card">
-      {discount_badge}
-      <img src="{offer["image"]}" alt="{safe_name}" loading="lazy">
-      <span class="price">{price_formatted}</span>
-      <a href="{offer["link"]}" target="_blank">{safe_name}</a>
-    </div>'''
-    
-    return f'''<!DOCTYPE html>
-<html lang="es">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>Mercado Libre - Ofertas del Día</title>
-  <style>
-    * {{ box-sizing: border-box; margin: 0; padding: 0; }}
-    body {{
-      font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-      background: #f5f5f5;
-      padding: 20px;
-    }}
-    .top-nav {{
-      max-width: 1400px;
-      margin: 0 auto 20px;
-      display: flex;
-      gap: 16px;
-      justify-content: center;
-    }}
-    .top-nav a {{
-      color: #3483fa;
-      text-decoration: none;
-      padding: 8px 16px;
-      background: white;
-      border-radius: 20px;
-      font-size: 14px;
-      box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-      transition: all 0.2s;
-    }}
-    .top-nav a:hover {{
-      background: #3483fa;
-      color: white;
-    }}
-    h1 {{
-      text-align: center;
-      color: #333;
-      margin-bottom: 10px;
-    }}
-    h2 {{
-      color: #333;
-      margin-bottom: 8px;
-    }}
-    .meta {{
-      text-align: center;
-      color: #666;
-      margin-bottom: 20px;
-      font-size: 14px;
-    }}
-    
-    /* MercadoTrack Featured Section */
-    .mercadotrack-section {{
-      max-width: 1400px;
-      margin: 0 auto 32px;
-      background: linear-gradient(135deg, #ff6b35 0%, #f7931e 50%, #ffd23f 100%);
-      border-radius: 16px;
-      padding: 24px;
-      color: white;
-    }}
-    .mt-header {{
-      display: flex;
-      justify-content: space-between;
-      align-items: center;
-      flex-wrap: wrap;
-      gap: 12px;
-    }}
-    .mercadotrack-section h2 {{
-      color: white;
-      font-size: 22px;
-      margin: 0;
-    }}
-    .mt-view-all {{
-      color: white;
-      text-decoration: none;
-      font-size: 14px;
-      background: rgba(0,0,0,0.2);
-      padding: 8px 16px;
-      border-radius: 20px;
-      transition: background 0.2s;
-    }}
-    .mt-view-all:hover {{
-      background: rgba(0,0,0,0.35);
-    }}
-    .mt-subtitle {{
-      color: rgba(255,255,255,0.85);
-      font-size: 14px;
-      margin: 8px 0 20px;
-    }}
-    .mt-grid {{
-      display: grid;
-      grid-template-columns: repeat(auto-fill, minmax(280px, 1fr));
-      gap: 16px;
-    }}
-    .mt-card {{
-      background: rgba(255,255,255,0.95);
-      border-radius: 12px;
-      padding: 12px;
-      display: flex;
-      gap: 12px;
-      text-decoration: none;
-      color: #333;
-      transition: transform 0.2s, box-shadow 0.2s;
-    }}
-    .mt-card:hover {{
-      transform: translateY(-2px);
-      box-shadow: 0 8px 24px rgba(0,0,0,0.15);
-    }}
-    .mt-image {{
-      position: relative;
-      flex-shrink: 0;
-      width: 80px;
-      height: 80px;
-      background: white;
-      border-radius: 8px;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-    }}
-    .mt-image img {{
-      max-width: 100%;
-      max-height: 100%;
-      object-fit: contain;
-    }}
-    .mt-discount {{
-      position: absolute;
-      top: -6px;
-      right: -6px;
-      background: #e53935;
-      color: white;
-      font-size: 11px;
-      font-weight: bold;
-      padding: 3px 6px;
-      border-radius: 4px;
-    }}
-    .mt-info {{
-      display: flex;
-      flex-direction: column;
-      justify-content: center;
-      gap: 6px;
-      min-width: 0;
-    }}
-    .mt-name {{
-      font-size: 13px;
-      line-height: 1.3;
-      display: -webkit-box;
-      -webkit-line-clamp: 2;
-      -webkit-box-orient: vertical;
-      overflow: hidden;
-      color: #333;
-    }}
-    .mt-prices {{
-      display: flex;
-      align-items: center;
-      gap: 8px;
-    }}
-    .mt-original {{
-      font-size: 12px;
-      color: #999;
-      text-decoration: line-through;
-    }}
-    .mt-price {{
-      font-size: 16px;
-      font-weight: bold;
-      color: #00a650;
-    }}
-    
-    /* Featured Section */
-    .featured-section {{
-      max-width: 1400px;
-      margin: 0 auto 40px;
-      background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%);
-      border-radius: 16px;
-      padding: 24px;
-      color: white;
-    }}
-    .featured-section h2 {{
-      color: white;
-      font-size: 22px;
-    }}
-    .featured-subtitle {{
-      color: #aaa;
-      font-size: 14px;
-      margin-bottom: 20px;
-    }}
-    .featured-grid {{
-      display: grid;
-      grid-template-columns: repeat(auto-fit, minmax(380px, 1fr));
-      gap: 20px;
-    }}
-    .featured-card {{
-      background: rgba(255,255,255,0.08);
-      border-radius: 12px;
-      padding: 16px;
-      display: grid;
-      grid-template-columns: 140px 1fr;
-      gap: 16px;
-    }}
-    .featured-image {{
-      position: relative;
-      background: white;
-      border-radius: 8px;
-      padding: 8px;
-    }}
-    .featured-image img {{
-      width: 100%;
-      height: 120px;
-      object-fit: contain;
-    }}
-    .featured-image .discount {{
-      position: absolute;
-      top: -8px;
-      right: -8px;
-      background: #00a650;
-      color: white;
-      font-size: 12px;
-      font-weight: bold;
-      padding: 4px 8px;
-      border-radius: 6px;
-    }}
-    .featured-info {{
-      display: flex;
-      flex-direction: column;
-      gap: 8px;
-    }}
-    .featured-title {{
-      color: white;
-      text-decoration: none;
-      font-size: 14px;
-      line-height: 1.4;
-      display: -webkit-box;
-      -webkit-line-clamp: 2;
-      -webkit-box-orient: vertical;
-      overflow: hidden;
-    }}
-    .featured-title:hover {{
-      text-decoration: underline;
-    }}
-    .featured-price {{
-      font-size: 24px;
-      font-weight: bold;
-      color: #00a650;
-    }}
-    .price-history {{
-      display: flex;
-      flex-direction: column;
-      gap: 6px;
-    }}
-    .analysis-badge {{
-      display: inline-block;
-      padding: 4px 10px;
-      border-radius: 12px;
-      font-size: 12px;
-      font-weight: 500;
-      color: white;
-      width: fit-content;
-    }}
-    .sparkline {{
-      margin: 4px 0;
-    }}
-    .price-stats {{
-      display: flex;
-      gap: 12px;
-      font-size: 11px;
-      color: #999;
-    }}
-    .price-stats span {{
-      display: inline-block;
-    }}
-    .mercadotrack-link {{
-      color: #3483fa;
-      text-decoration: none;
-      font-size: 12px;
-    }}
-    .mercadotrack-link:hover {{
-      text-decoration: underline;
-    }}
-    .no-data {{
-      color: #666;
-      font-size: 12px;
-      font-style: italic;
-    }}
-    
-    /* Regular Grid */
-    .all-offers-title {{
-      max-width: 1400px;
-      margin: 0 auto 8px;
-      color: #333;
-    }}
-    .all-offers-subtitle {{
-      max-width: 1400px;
-      margin: 0 auto 16px;
-      color: #666;
-      font-size: 14px;
-    }}
-    .all-offers-subtitle a {{
-      color: #3483fa;
-      text-decoration: none;
-    }}
-    .all-offers-subtitle a:hover {{
-      text-decoration: underline;
-    }}
-    .grid {{
-      display: grid;
-      grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
-      gap: 16px;
-      max-width: 1400px;
-      margin: 0 auto;
-    }}
-    .card {{
-      background: white;
-      border-radius: 8px;
-      padding: 12px;
-      box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-      display: flex;
-      flex-direction: column;
-      align-items: center;
-      position: relative;
-    }}
-    .card img {{
-      width: 100%;
-      height: 150px;
-      object-fit: contain;
-      margin-bottom: 10px;
-    }}
-    .card a {{
-      color: #3483fa;
-      text-decoration: none;
-      font-size: 13px;
-      text-align: center;
-      line-height: 1.3;
-    }}
-    .card a:hover {{
-      text-decoration: underline;
-    }}
-    .discount {{
-      position: absolute;
-      top: 8px;
-      right: 8px;
-      background: #00a650;
-      color: white;
-      font-size: 11px;
-      font-weight: bold;
-      padding: 3px 6px;
-      border-radius: 4px;
-    }}
-    .price {{
-      font-size: 18px;
-      font-weight: bold;
-      color: #333;
-      margin-bottom: 8px;
-    }}
-    
-    @media (max-width: 480px) {{
-      .featured-grid {{
-        grid-template-columns: 1fr;
-      }}
-      .featured-card {{
-        grid-template-columns: 1fr;
-      }}
-    }}
-  </style>
-</head>
-<body>
-  <nav class="top-nav">
-    <a href="index.html" class="nav-home" target="_top">🏠 Inicio</a>
-    <a href="archive.html" class="nav-archive" target="_top">📅 Ver archivo</a>
-  </nav>
-  <h1>Ofertas del Día - Mercado Libre</h1>
-  <p class="meta">Actualizado: {timestamp} | {len(offers)} ofertas (ordenadas por descuento)</p>
-  {mt_html}
-  {featured_html}
-  <h3 class="all-offers-title">Todas las ofertas</h3>
-  <p class="all-offers-subtitle">Ofertas del Día y Ofertas Relámpago extraídas de <a href="https://www.mercadolibre.com.ar/ofertas" target="_blank">mercadolibre.com.ar/ofertas</a>, ordenadas por descuento</p>
-  <div class="grid">{cards_html}
-  </div>
-</body>
-</html>
-'''
+    return _TEMPLATE.render(
+        timestamp=timestamp,
+        offers=offers,
+        featured_offers=featured_offers or [],
+        mt_offers=mt_offers or [],
+    )
+
+
+def write_html(output_file: Path, offers: list[dict], featured_offers: list[dict] | None = None, mt_offers: list[dict] | None = None) -> None:
+    """Stream the rendered offers page to disk atomically.
+
+    Template streaming writes fragments into the file as they render
+    instead of materializing the whole page as one string; the tmp+rename
+    keeps readers (GitHub Pages) from ever seeing a truncated page.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    tmp_file = output_file.with_suffix(".html.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        _TEMPLATE.stream(
+            timestamp=timestamp,
+            offers=offers,
+            featured_offers=featured_offers or [],
+            mt_offers=mt_offers or [],
+        ).dump(f)
+    os.replace(tmp_file, output_file)
 
 
 def fetch_top_offers_history(offers: list[dict], top_n: int = 3) -> list[dict]:
     """Fetch price history for the top N discounted offers."""
-    log.info(f"\n🔍 Verificando historial de precios para top {top_n} ofertas...")
+    log.info("\n🔍 Verificando historial de precios para top %d ofertas...", top_n)
     log.info("-" * 40)
     
-    featured = []
-    for i, offer in enumerate(offers[:top_n]):
+    top_offers = offers[:top_n]
+    if not top_offers:
+        return []
+
+    def process_one(offer: dict) -> dict:
+        """Fetch and analyze one offer's history, returning the enriched copy."""
+        offer_copy = offer.copy()
         mla_id = extract_mla_id(offer["link"])
-        log.info(f"  [{i+1}/{top_n}] {offer['name'][:50]}...")
-        
         if mla_id:
-            log.info(f"    → Buscando {mla_id} en MercadoTrack...")
             snapshots = fetch_price_history(mla_id)
-            analysis = analyze_price_history(snapshots, offer.get("price", 0))
-            offer_copy = offer.copy()
-            offer_copy["price_analysis"] = analysis
+            offer_copy["price_analysis"] = analyze_price_history(snapshots, offer.get("price", 0))
             offer_copy["mla_id"] = mla_id
-            featured.append(offer_copy)
-            log.info(f"    → {analysis['message']}")
         else:
-            log.warning(f"    → No se pudo extraer MLA ID from {offer['link']}")
-            offer_copy = offer.copy()
             offer_copy["price_analysis"] = {"status": "unknown", "message": "ID no encontrado"}
-            featured.append(offer_copy)
-    
+            offer_copy["mla_id"] = ""
+        return offer_copy
+
+    # Each offer is an independent network round trip, so process them
+    # concurrently; executor.map keeps the results in discount order
+    with ThreadPoolExecutor(max_workers=min(8, len(top_offers))) as executor:
+        featured = list(executor.map(process_one, top_offers))
+
+    for i, offer in enumerate(featured):
+        log.info("  [%d/%d] %.50s...", i + 1, top_n, offer["name"])
+        if offer["mla_id"]:
+            log.info("    → %s", offer["price_analysis"]["message"])
+        else:
+            log.warning("    → No se pudo extraer MLA ID from %s", offer["link"])
+
     return featured
 
 
+def _offers_digest(offers: list[dict]) -> str:
+    """Content hash of the scraped offer set, insensitive to scrape order."""
+    key = [(o.get("link", ""), o.get("price", 0), o.get("discount", 0))
+           for o in sorted(offers, key=itemgetter("link"))]
+    data = orjson.dumps(key) if orjson is not None else json.dumps(key).encode("utf-8")
+    # blake2b is the fastest stdlib hash for short payloads like this
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _read_last_hash(hash_file: Path) -> str | None:
+    """Read the previous run's offer digest, or None when absent."""
+    try:
+        return hash_file.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def persist_offers_history(offers: list[dict], offers_dir: Path, ts: int) -> None:
+    """Append this run's offers to the SQLite history DB in docs/.
+
+    The dated HTML pages are write-only views; the DB keeps one normalized
+    row per (product, run) so local trend analysis can query history
+    without re-parsing old pages or hitting MercadoTrack.
+    """
+    rows = [
+        (
+            extract_mla_id(offer.get("link", "")) or offer.get("link", ""),
+            ts,
+            offer.get("price", 0),
+            offer.get("discount", 0),
+            offer.get("name", ""),
+        )
+        for offer in offers
+    ]
+    if not rows:
+        return
+
+    db_file = offers_dir / "history.sqlite"
+    try:
+        with sqlite3.connect(db_file) as conn:
+            # WAL + NORMAL: one batched transaction per run, no fsync per row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS offers (
+                    mla_id TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    price REAL,
+                    discount INTEGER,
+                    name TEXT,
+                    PRIMARY KEY (mla_id, ts)
+                )"""
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO offers (mla_id, ts, price, discount, name) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        conn.close()
+        log.info(f"History DB updated: {len(rows)} offers")
+    except sqlite3.Error as e:
+        log.error(f"Could not persist offers history: {e}")
+
+
+def update_offers_manifest(offers_dir: Path, new_file: str | None = None) -> None:
+    """Write manifest.json listing the dated offer pages, newest first.
+
+    Gives index/archive pages a machine-readable listing of available days
+    instead of having to guess filenames from the current date.
+
+    Only one page is added per day, so when the previous manifest exists we
+    just prepend `new_file` to it instead of re-globbing and re-sorting a
+    directory that grows with site age; the full scan is the fallback for a
+    missing/corrupt manifest (and backfills out-of-band additions).
+    """
+    manifest_file = offers_dir / "manifest.json"
+    files = None
+    if new_file is not None:
+        previous = _read_json_file(manifest_file)
+        if isinstance(previous, dict) and isinstance(previous.get("files"), list):
+            # dict.fromkeys dedups while keeping newest-first order
+            files = list(dict.fromkeys([new_file] + previous["files"]))
+    if files is None:
+        files = sorted((p.name for p in offers_dir.glob("offers-*.html")), reverse=True)
+    manifest = {
+        "generated_at": datetime.now().isoformat(),
+        "files": files,
+    }
+    # orjson serializes the whole document in C; indent for diff-friendly
+    # commits of docs/
+    if orjson is not None:
+        data = orjson.dumps(manifest, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8")
+    # Same tmp+rename dance as the offers page: the next run's incremental
+    # path and any readers must never see a half-written manifest
+    tmp_file = manifest_file.with_suffix(".json.tmp")
+    tmp_file.write_bytes(data)
+    os.replace(tmp_file, manifest_file)
+    log.info(f"Manifest updated: {len(files)} offer pages")
+
+
 def main():
     start_time = datetime.now()
+    t0 = time.monotonic()
     log.info("=" * 50)
     log.info("Mercado Libre Offers Scraper - Run Started")
-    log.info(f"Timestamp: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    log.info("Timestamp: %s", start_time.strftime("%Y-%m-%d %H:%M:%S"))
     log.info("=" * 50)
     
     try:
-        # Fetch MercadoTrack featured offers first
-        mt_offers = fetch_mercadotrack_featured()
-        
+        _prune_cache()
+
+        # The MercadoTrack featured fetch is independent of the ML scrape,
+        # so run it concurrently instead of paying both latencies in series.
+        # A daemon thread with a result queue (rather than an executor) is
+        # what makes the 60s bound real: executor shutdown would join a
+        # wedged fetch thread anyway, stalling the run after the "timeout"
+        mt_result: queue.Queue = queue.Queue(maxsize=1)
+        mt_thread = threading.Thread(
+            target=lambda: mt_result.put(fetch_mercadotrack_featured()),
+            daemon=True,
+        )
+        mt_thread.start()
         offers = scrape_offers(pages_per_source=3)
-        log.info(f"\nTotal offers collected: {len(offers)}")
-        
-        # Fetch price history for top 3 discounted offers
-        featured_offers = fetch_top_offers_history(offers, top_n=3)
-        
-        html = generate_html(offers, featured_offers, mt_offers)
-        
+        try:
+            mt_offers = mt_result.get(timeout=60)
+        except queue.Empty:
+            log.error("MercadoTrack featured fetch timed out, continuing without it")
+            mt_offers = []
+        log.info("\nTotal offers collected: %d", len(offers))
+
         # Ensure docs directory exists (GitHub Pages standard folder)
         offers_dir = Path(__file__).parent / "docs"
         offers_dir.mkdir(exist_ok=True)
-        
+
         output_file = offers_dir / f"offers-{start_time.strftime('%Y-%m-%d')}.html"
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(html)
-        
-        elapsed = (datetime.now() - start_time).total_seconds()
-        log.info(f"\nOutput written to: {output_file}")
-        log.info(f"Run completed successfully in {elapsed:.1f}s")
-        log.info(f"Summary: {len(offers)} offers, {len(featured_offers)} with price history, {len(mt_offers)} MercadoTrack featured")
+
+        # Rendering is a pure function of the scraped data, so when today's
+        # page exists and the offer set is byte-identical to the last run
+        # (re-runs on the same day) the whole render/write pass is skipped
+        digest = _offers_digest(offers)
+        hash_file = offers_dir / ".last_hash"
+        if output_file.exists() and _read_last_hash(hash_file) == digest:
+            featured_offers = []
+            log.info("Offers unchanged since last run, skipping render")
+        else:
+            # Fetch price history for top 3 discounted offers
+            featured_offers = fetch_top_offers_history(offers, top_n=3)
+
+            write_html(output_file, offers, featured_offers, mt_offers)
+
+            # Compressed companion for the archive; the repeated card markup
+            # and shared CSS compress ~10x, and the plain file stays for Pages
+            gz_file = output_file.with_suffix(".html.gz")
+            with gzip.open(gz_file, "wb", compresslevel=6) as gz:
+                gz.write(output_file.read_bytes())
+
+            update_offers_manifest(offers_dir, output_file.name)
+            persist_offers_history(offers, offers_dir, int(start_time.timestamp()))
+            hash_file.write_text(digest, encoding="utf-8")
+
+        elapsed = time.monotonic() - t0
+        log.info("\nOutput written to: %s", output_file)
+        log.info("Run completed successfully in %.1fs", elapsed)
+        log.info("Summary: %d offers, %d with price history, %d MercadoTrack featured", len(offers), len(featured_offers), len(mt_offers))
         
     except Exception as e:
-        log.error(f"Fatal error during scrape: {type(e).__name__}: {e}")
+        log.error("Fatal error during scrape: %s: %s", type(e).__name__, e)
         raise
     finally:
         log.info("=" * 50)